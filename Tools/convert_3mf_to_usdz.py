@@ -1,40 +1,108 @@
 #!/usr/bin/env python3
 import argparse
 import os
+import re
 import tempfile
-import zipfile
 
 import numpy as np
 import trimesh
 
-USD_TEMPLATE = """#usda 1.0
+from usd_emit import format_indices, write_usdz
+
+USD_TEMPLATE = b"""#usda 1.0
 (
     metersPerUnit = 1
 )
 
-def Xform \"Root\" {{
-    def Mesh \"Stone\" {{
+def Xform \"Root\" {
+    def Mesh \"Stone\" {
         point3f[] points = [
-{points}
+%(points)b
         ]
-        int[] faceVertexCounts = [{face_counts}]
-        int[] faceVertexIndices = [{indices}]
+        int[] faceVertexCounts = [%(face_counts)b]
+        int[] faceVertexIndices = [%(indices)b]
         uniform token subdivisionScheme = \"none\"
         rel material:binding = </Root/Material>
-    }}
+    }
 
-    def Material \"Material\" {{
+    def Material \"Material\" {
         token outputs:surface.connect = </Root/Material/PreviewSurface.outputs:surface>
-        def Shader \"PreviewSurface\" {{
+        def Shader \"PreviewSurface\" {
             uniform token info:id = \"UsdPreviewSurface\"
-            color3f inputs:diffuseColor = ({color})
+            color3f inputs:diffuseColor = (%(color)b)
             float inputs:metallic = 0
             float inputs:roughness = 0.8
             token outputs:surface
-        }}
-    }}
-}}
+        }
+    }
+}
 """
+# Alternating literal chunks and field names: [literal, name, literal, ..., literal].
+TEMPLATE_PARTS = re.split(rb"%\((\w+)\)b", USD_TEMPLATE)
+
+
+def compact(verts, faces):
+    # Drop unreferenced vertices and remap face indices with a prefix sum.
+    used = np.zeros(len(verts), dtype=bool)
+    used[faces.ravel()] = True
+    remap = np.cumsum(used) - 1
+    return verts[used], remap[faces]
+
+
+def face_quadrics(verts, faces):
+    # Area-weighted Garland-Heckbert plane quadrics, one 4x4 matrix per face.
+    a, b, c = verts[faces[:, 0]], verts[faces[:, 1]], verts[faces[:, 2]]
+    cross = np.cross(b - a, c - a)
+    area = np.linalg.norm(cross, axis=1)
+    normals = cross / np.where(area > 0, area, 1.0)[:, None]
+    planes = np.hstack([normals, -np.einsum("ij,ij->i", normals, a)[:, None]])
+    return 0.5 * area[:, None, None] * planes[:, :, None] * planes[:, None, :]
+
+
+def cluster_vertices(verts, faces, quadrics, resolution):
+    # Snap vertices to a uniform grid and place each cell's representative at the
+    # point minimising its accumulated quadric error, relative to the cell mean.
+    origin = verts.min(axis=0)
+    span = float(np.ptp(verts, axis=0).max()) or 1.0
+    cells = np.minimum(((verts - origin) / span * resolution).astype(np.int64), resolution - 1)
+    keys = (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+    _, cluster = np.unique(keys, return_inverse=True)
+    cluster = cluster.ravel()
+    count = int(cluster.max()) + 1
+
+    q = np.zeros((count, 4, 4))
+    for corner in range(3):
+        np.add.at(q, cluster[faces[:, corner]], quadrics)
+    mean = np.zeros((count, 3))
+    np.add.at(mean, cluster, verts)
+    mean /= np.bincount(cluster, minlength=count)[:, None]
+    a, b = q[:, :3, :3], q[:, :3, 3]
+    residual = -(np.einsum("kij,kj->ki", a, mean) + b)
+    positions = mean + np.einsum("kij,kj->ki", np.linalg.pinv(a, rcond=1e-3), residual)
+
+    new_faces = cluster[faces]
+    keep = (
+        (new_faces[:, 0] != new_faces[:, 1])
+        & (new_faces[:, 1] != new_faces[:, 2])
+        & (new_faces[:, 0] != new_faces[:, 2])
+    )
+    new_faces = new_faces[keep]
+    _, first = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+    return positions, new_faces[np.sort(first)]
+
+
+def decimate(verts, faces, target):
+    # Quadric-weighted vertex clustering; shrink the grid until the face budget is met.
+    quadrics = face_quadrics(verts, faces)
+    resolution = max(2, int(np.sqrt(target)))
+    while True:
+        new_verts, new_faces = cluster_vertices(verts, faces, quadrics, resolution)
+        if len(new_faces) <= target or resolution <= 2:
+            break
+        shrink = np.sqrt(target / len(new_faces))
+        resolution = max(2, min(resolution - 1, int(resolution * shrink)))
+    return compact(new_verts, new_faces)
+
 
 parser = argparse.ArgumentParser(description="Convert 3MF mesh into USDZ")
 parser.add_argument("input", help="Path to .3mf file")
@@ -43,6 +111,7 @@ parser.add_argument("--color", default="0.6, 0.6, 0.6", help="RGB diffuse color
 parser.add_argument("--target-faces", type=int, default=20000, help="Approximate number of faces after simplification")
 parser.add_argument("--center", action="store_true", help="Center mesh around the origin before export")
 parser.add_argument("--target-size", type=float, default=0.98, help="Longest edge after normalization")
+parser.add_argument("--precision", type=int, default=3, help="Decimal places written for vertex coordinates")
 args = parser.parse_args()
 
 input_path = os.path.abspath(args.input)
@@ -62,48 +131,64 @@ if args.target_faces and len(mesh.faces) > args.target_faces:
     try:
         mesh = mesh.simplify_quadratic_decimation(args.target_faces)
     except BaseException as exc:
-        print(f"Warning: simplification failed ({exc}), using sampled subset of faces", flush=True)
-        step = max(1, len(mesh.faces) // args.target_faces)
-        face_indices = np.arange(0, len(mesh.faces), step)
-        mesh = mesh.submesh([face_indices], append=True)
-        if len(mesh.faces) > args.target_faces:
-            mesh = mesh.submesh([np.arange(args.target_faces)], append=True)
-        mesh.remove_unreferenced_vertices()
-
-if args.center:
-    mesh.vertices -= mesh.center_mass
+        print(f"Warning: simplification failed ({exc}), falling back to quadric clustering", flush=True)
+        simplified_verts, simplified_faces = decimate(
+            np.asarray(mesh.vertices.view(np.ndarray), dtype=np.float64),
+            np.asarray(mesh.faces.view(np.ndarray), dtype=np.int64),
+            args.target_faces,
+        )
+        mesh = trimesh.Trimesh(vertices=simplified_verts, faces=simplified_faces, process=False)
+
+# Read the center of mass first, then center and scale the raw vertex buffer in
+# place: no copy, and no trimesh tracked-array cache invalidation.
+center = mesh.center_mass if args.center else None
+verts = np.asarray(mesh.vertices.view(np.ndarray), dtype=np.float64)
+faces = np.asarray(mesh.faces.view(np.ndarray), dtype=np.int64)
+
+if center is not None:
+    verts -= center
 
 if args.target_size:
-    bounds = mesh.bounds
-    extents = bounds[1] - bounds[0]
-    longest = float(np.max(extents))
+    longest = float(np.ptp(verts, axis=0).max())
     if longest > 0:
         scale = args.target_size / longest
-        mesh.apply_scale(scale)
-
-verts = np.asarray(mesh.vertices)
-faces = np.asarray(mesh.faces)
-
-def format_points(array):
-    lines = []
-    for v in array:
-        lines.append(f"            ({v[0]:.4f}, {v[1]:.4f}, {v[2]:.4f})")
-    return "\n".join(lines)
-
-face_counts = ", ".join(["3"] * len(faces))
-indices = ", ".join(str(idx) for face in faces for idx in face)
-color = args.color
+        verts *= scale
+
+# Merge vertices that print identically at the requested precision and drop any
+# faces that collapse as a result.
+_, first_index, inverse = np.unique(np.round(verts, args.precision), axis=0, return_index=True, return_inverse=True)
+verts = verts[first_index]
+faces = inverse.ravel()[faces]
+faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+
+def format_points(array, precision):
+    # One bytes %-format call over the flattened coordinates instead of one f-string per vertex.
+    if len(array) == 0:
+        return b""
+    point_line = b"            (%%.%df, %%.%df, %%.%df)" % (precision, precision, precision)
+    coords = np.asarray(array, dtype=np.float64).ravel().tolist()
+    return b"\n".join([point_line] * len(array)) % tuple(coords)
+
+
+face_counts = b"3, " * (len(faces) - 1) + b"3" if len(faces) else b""
+indices = format_indices(faces.ravel().tolist())
+color = args.color.encode("utf-8")
 if os.path.exists(output_path):
     os.remove(output_path)
 
-usda_content = USD_TEMPLATE.format(
-    points=format_points(verts),
-    face_counts=face_counts,
-    indices=indices,
-    color=color
+fields = {
+    b"points": format_points(verts, args.precision),
+    b"face_counts": face_counts,
+    b"indices": indices,
+    b"color": color,
+}
+
+# Hand the template pieces and fields to the writer as-is rather than joining
+# them into one payload first.
+chunks = [fields[part] if position % 2 else part for position, part in enumerate(TEMPLATE_PARTS)]
+usda_size = write_usdz(output_path, chunks)
+
+print(
+    f"Converted {input_path} -> {output_path} "
+    f"(usda: {usda_size} bytes, usdz: {os.path.getsize(output_path)} bytes)"
 )
-
-with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
-    archive.writestr("default.usda", usda_content)
-
-print(f"Converted {input_path} -> {output_path}")
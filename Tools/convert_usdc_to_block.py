@@ -14,12 +14,16 @@ Usage:
 """
 
 import argparse
+import functools
 import os
-import zipfile
 from pathlib import Path
 
+from usd_emit import format_indices, write_usdz
+
 DEFAULT_SIZE = 0.98
 DEFAULT_COLOR = (0.72, 0.18, 0.2)
+_FMT = "(%.3f, %.3f, %.3f)"
+_COLOR_FMT = "(%.3f, %.3f, %.3f)"
 TRIANGLES = [
     (0, 1, 2), (0, 2, 3),
     (4, 6, 5), (4, 7, 6),
@@ -28,9 +32,12 @@ TRIANGLES = [
     (1, 5, 6), (1, 6, 2),
     (4, 0, 3), (4, 3, 7),
 ]
+_COUNTS_STR = ", ".join(["3"] * len(TRIANGLES))
+_INDICES_STR = format_indices([i for tri in TRIANGLES for i in tri]).decode("ascii")
 
 
-def build_cube_usda(size: float, color: tuple[float, float, float]) -> str:
+def _cube_template(size: float) -> tuple[str, str]:
+    # Geometry is rendered up front and split around the diffuse color, the only per-block value.
     half = size / 2.0
     points = [
         (-half, -half, -half),
@@ -43,14 +50,7 @@ def build_cube_usda(size: float, color: tuple[float, float, float]) -> str:
         (-half, half, half),
     ]
 
-    def fmt(vec: tuple[float, float, float]) -> str:
-        return f"({vec[0]:.4f}, {vec[1]:.4f}, {vec[2]:.4f})"
-
-    counts_str = ", ".join("3" for _ in TRIANGLES)
-    indices_str = ", ".join(str(i) for tri in TRIANGLES for i in tri)
-
-    r, g, b = color
-    return f"""#usda 1.0
+    body = f"""#usda 1.0
 (
     metersPerUnit = 1
 )
@@ -58,10 +58,10 @@ def build_cube_usda(size: float, color: tuple[float, float, float]) -> str:
 def Xform "Root" {{
     def Mesh "PipestoneBlock" {{
         uniform token subdivisionScheme = "none"
-        point3f[] points = [{", ".join(fmt(p) for p in points)}]
-        int[] faceVertexCounts = [{counts_str}]
-        int[] faceVertexIndices = [{indices_str}]
-        float3[] extent = [{fmt((-half, -half, -half))}, {fmt((half, half, half))}]
+        point3f[] points = [{", ".join(_FMT % p for p in points)}]
+        int[] faceVertexCounts = [{_COUNTS_STR}]
+        int[] faceVertexIndices = [{_INDICES_STR}]
+        float3[] extent = [{_FMT % (-half, -half, -half)}, {_FMT % (half, half, half)}]
         rel material:binding = </Root/Material>
     }}
 
@@ -69,7 +69,7 @@ def Xform "Root" {{
         token outputs:surface.connect = </Root/Material/PreviewSurface.outputs:surface>
         def Shader "PreviewSurface" {{
             uniform token info:id = "UsdPreviewSurface"
-            color3f inputs:diffuseColor = ({r:.3f}, {g:.3f}, {b:.3f})
+            color3f inputs:diffuseColor = {_COLOR_FMT}
             float inputs:roughness = 0.4
             float inputs:metallic = 0.0
             token outputs:surface
@@ -77,6 +77,17 @@ def Xform "Root" {{
     }}
 }}
 """
+    prefix, _, suffix = body.partition(_COLOR_FMT)
+    return prefix, suffix
+
+
+_DEFAULT_TEMPLATE = _cube_template(DEFAULT_SIZE)
+
+
+@functools.lru_cache(maxsize=32)
+def build_cube_usda(size: float, color: tuple[float, float, float]) -> str:
+    prefix, suffix = _DEFAULT_TEMPLATE if size == DEFAULT_SIZE else _cube_template(size)
+    return prefix + _COLOR_FMT % tuple(color) + suffix
 
 
 def main() -> None:
@@ -97,8 +108,7 @@ def main() -> None:
 
     usda_content = build_cube_usda(args.size, tuple(args.color))
 
-    with zipfile.ZipFile(dest_path, "w", compression=zipfile.ZIP_STORED) as archive:
-        archive.writestr("default.usda", usda_content)
+    write_usdz(dest_path, [usda_content.encode("utf-8")])
 
     print(f"Created {dest_path} (size: {dest_path.stat().st_size} bytes)")
 
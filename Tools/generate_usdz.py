@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
+import functools
 import json
 import os
-import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from usd_emit import format_indices, write_usdz
 
 BLOCKS = {
     "SoilBlock": {"color": (0.52, 0.33, 0.18)},
@@ -13,6 +17,8 @@ BLOCKS = {
 }
 
 CUBE_SIZE = 0.98
+_FMT = "(%.3f, %.3f, %.3f)"
+_COLOR_FMT = "(%.3f, %.3f, %.3f)"
 CUBE_TRIANGLES = [
     (0, 1, 2), (0, 2, 3),  # front (-Z)
     (4, 6, 5), (4, 7, 6),  # back (+Z)
@@ -21,17 +27,12 @@ CUBE_TRIANGLES = [
     (1, 5, 6), (1, 6, 2),  # right (+X)
     (4, 0, 3), (4, 3, 7),  # left (-X)
 ]
-CUBE_NORMALS = [
-    (0, 0, -1), (0, 0, -1),
-    (0, 0, 1), (0, 0, 1),
-    (0, -1, 0), (0, -1, 0),
-    (0, 1, 0), (0, 1, 0),
-    (1, 0, 0), (1, 0, 0),
-    (-1, 0, 0), (-1, 0, 0),
-]
+_COUNTS_STR = ", ".join(["3"] * len(CUBE_TRIANGLES))
+_INDICES_STR = format_indices([i for tri in CUBE_TRIANGLES for i in tri]).decode("ascii")
 
 
-def build_cube_payload(color: tuple[float, float, float], size: float = CUBE_SIZE) -> str:
+def _cube_template(size: float) -> tuple[str, str]:
+    # Geometry is rendered up front and split around the diffuse color, the only per-block value.
     half = size / 2.0
     points = [
         (-half, -half, -half),
@@ -44,17 +45,7 @@ def build_cube_payload(color: tuple[float, float, float], size: float = CUBE_SIZ
         (-half, half, half),
     ]
 
-    def fmt(vec: tuple[float, float, float]) -> str:
-        return f"({vec[0]:.4f}, {vec[1]:.4f}, {vec[2]:.4f})"
-
-    counts = ", ".join("3" for _ in CUBE_TRIANGLES)
-    indices = ", ".join(str(i) for tri in CUBE_TRIANGLES for i in tri)
-    normals = []
-    for normal in CUBE_NORMALS:
-        normals.extend([normal, normal, normal])
-    normals_str = ", ".join(fmt(n) for n in normals)
-
-    return f"""#usda 1.0
+    body = f"""#usda 1.0
 (
     metersPerUnit = 1
 )
@@ -62,10 +53,10 @@ def build_cube_payload(color: tuple[float, float, float], size: float = CUBE_SIZ
 def Xform "Root" {{
     def Mesh "Block" {{
         uniform token subdivisionScheme = "none"
-        point3f[] points = [{", ".join(fmt(p) for p in points)}]
-        int[] faceVertexCounts = [{counts}]
-        int[] faceVertexIndices = [{indices}]
-        float3[] extent = [{fmt((-half, -half, -half))}, {fmt((half, half, half))}]
+        point3f[] points = [{", ".join(_FMT % p for p in points)}]
+        int[] faceVertexCounts = [{_COUNTS_STR}]
+        int[] faceVertexIndices = [{_INDICES_STR}]
+        float3[] extent = [{_FMT % (-half, -half, -half)}, {_FMT % (half, half, half)}]
         rel material:binding = </Root/Material>
     }}
 
@@ -73,7 +64,7 @@ def Xform "Root" {{
         token outputs:surface.connect = </Root/Material/PreviewSurface.outputs:surface>
         def Shader "PreviewSurface" {{
             uniform token info:id = "UsdPreviewSurface"
-            color3f inputs:diffuseColor = ({color[0]:.3f}, {color[1]:.3f}, {color[2]:.3f})
+            color3f inputs:diffuseColor = {_COLOR_FMT}
             float inputs:roughness = 0.4
             float inputs:metallic = 0.0
             token outputs:surface
@@ -81,18 +72,35 @@ def Xform "Root" {{
     }}
 }}
 """
+    prefix, _, suffix = body.partition(_COLOR_FMT)
+    return prefix, suffix
+
+
+_DEFAULT_TEMPLATE = _cube_template(CUBE_SIZE)
+
+
+@functools.lru_cache(maxsize=32)
+def build_cube_payload(color: tuple[float, float, float], size: float = CUBE_SIZE) -> str:
+    prefix, suffix = _DEFAULT_TEMPLATE if size == CUBE_SIZE else _cube_template(size)
+    return prefix + _COLOR_FMT % tuple(color) + suffix
+
+
+def _emit(name: str, color: tuple[float, float, float], root: str) -> str:
+    usdz_path = os.path.join(root, f"{name}.usdz")
+    payload = build_cube_payload(color)
+    write_usdz(usdz_path, [payload.encode("utf-8")])
+    return usdz_path
 
 
 def main() -> None:
     root = os.path.join(os.getcwd(), "Sources", "CaveOfNationsApp", "Resources", "Blocks")
     os.makedirs(root, exist_ok=True)
 
-    for name, info in BLOCKS.items():
-        usdz_path = os.path.join(root, f"{name}.usdz")
-        payload = build_cube_payload(info["color"])
-        with zipfile.ZipFile(usdz_path, "w", compression=zipfile.ZIP_STORED) as archive:
-            archive.writestr("default.usda", payload)
-        print(f"Generated {usdz_path}")
+    names = list(BLOCKS)
+    colors = [BLOCKS[name]["color"] for name in names]
+    with ProcessPoolExecutor(max_workers=min(len(names), os.cpu_count() or 1)) as executor:
+        for usdz_path in executor.map(_emit, names, colors, repeat(root)):
+            print(f"Generated {usdz_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+"""Shared USDA/USDZ output helpers for the Cave of Nations asset tools.
+
+The block generators and the 3MF converter all emit a single ``default.usda``
+entry inside a USDZ archive. USDZ requires that entry to be stored
+uncompressed with its data starting on a 64-byte boundary, so the archive is
+packed by hand here rather than through ``zipfile``. Only the standard library
+is used, keeping the cube scripts free of third-party dependencies.
+"""
+
+import struct
+import time
+import zlib
+
+USDZ_ALIGNMENT = 64
+USDZ_PADDING_ID = 0x1986
+
+
+def format_indices(indices: list[int]) -> bytes:
+    # A single bytes %-format over the flat index list instead of one str() per index.
+    return b", ".join([b"%d"] * len(indices)) % tuple(indices)
+
+
+def write_usdz(path, chunks: list[bytes], name: str = "default.usda") -> int:
+    """Write ``chunks`` as one stored, 64-byte aligned entry and return its size."""
+    encoded_name = name.encode("utf-8")
+    padding = -(30 + len(encoded_name) + 4) % USDZ_ALIGNMENT
+    extra = struct.pack("<HH", USDZ_PADDING_ID, padding) + b"\0" * padding
+    now = time.localtime()
+    dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+    dos_date = ((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
+    crc = 0
+    size = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+
+    local_header = struct.pack(
+        "<IHHHHHIIIHH", 0x04034B50, 20, 0, 0, dos_time, dos_date, crc, size, size, len(encoded_name), len(extra)
+    ) + encoded_name + extra
+    central_directory = struct.pack(
+        "<IHHHHHHIIIHHHHHII", 0x02014B50, 0x0314, 20, 0, 0, dos_time, dos_date, crc, size, size,
+        len(encoded_name), 0, 0, 0, 0, 0o100644 << 16, 0,
+    ) + encoded_name
+    directory_offset = len(local_header) + size
+    end_record = struct.pack(
+        "<IHHHHIIH", 0x06054B50, 0, 0, 1, 1, len(central_directory), directory_offset, 0
+    )
+    with open(path, "wb") as handle:
+        handle.write(local_header)
+        handle.writelines(chunks)
+        handle.write(central_directory + end_record)
+    return size